@@ -1,39 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numba
+
 import ct_hiv_model_econ_eval.input_data as data
 import ct_hiv_model_econ_eval.model_classes as model
 import ct_hiv_model_econ_eval.param_classes as param
 import ct_hiv_model_econ_eval.support as support
 
-# simulating mono therapy
-# create a cohort
-cohort_mono = model.Cohort(id=0,
-                           pop_size=data.POP_SIZE,
-                           parameters=param.Parameters(therapy=param.Therapies.MONO))
-# simulate the cohort
-cohort_mono.simulate(sim_length=data.SIM_LENGTH)
-
-# simulating combination therapy
-# create a cohort
-cohort_combo = model.Cohort(id=1,
-                            pop_size=data.POP_SIZE,
-                            parameters=param.Parameters(therapy=param.Therapies.COMBO))
-# simulate the cohort
-cohort_combo.simulate(sim_length=data.SIM_LENGTH)
-
-# print the estimates for the mean survival time and mean time to AIDS
-support.print_outcomes(sim_outcomes=cohort_mono.cohortOutcomes,
-                       therapy_name=param.Therapies.MONO)
-support.print_outcomes(sim_outcomes=cohort_combo.cohortOutcomes,
-                       therapy_name=param.Therapies.COMBO)
-
-# draw survival curves and histograms
-support.plot_survival_curves_and_histograms(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                                            sim_outcomes_combo=cohort_combo.cohortOutcomes)
-
-
-# print comparative outcomes
-support.print_comparative_outcomes(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                                   sim_outcomes_combo=cohort_combo.cohortOutcomes)
-
-# report the CEA results
-support.report_CEA_CBA(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                       sim_outcomes_combo=cohort_combo.cohortOutcomes)
+
+def simulate_cohort(therapy, n_threads=None):
+    """ simulates a cohort under the specified therapy
+    :param therapy: selected therapy
+    :param n_threads: number of threads the numba simulation kernel may use
+                      (None to use all cores; set when cohorts are simulated in parallel processes)
+    :return: outcomes of the simulated cohort
+    """
+    if n_threads is not None:
+        numba.set_num_threads(n_threads)
+
+    # create a cohort (use the therapy value as the cohort ID)
+    cohort = model.Cohort(id=therapy.value,
+                          pop_size=data.POP_SIZE,
+                          parameters=param.Parameters(therapy=therapy))
+    # simulate the cohort
+    cohort.simulate(sim_length=data.SIM_LENGTH)
+
+    return cohort.cohortOutcomes
+
+
+if __name__ == '__main__':
+
+    # simulating mono therapy and combination therapy
+    if data.PARALLEL_COHORTS:
+        # the two cohorts are independent, so they can be simulated in parallel processes
+        # (each process gets half of numba's threads so the thread pools of the two processes
+        # do not oversubscribe the cores)
+        n_threads = max(1, numba.config.NUMBA_NUM_THREADS // 2)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            outcomes_mono, outcomes_combo = executor.map(
+                simulate_cohort, [param.Therapies.MONO, param.Therapies.COMBO], [n_threads, n_threads])
+    else:
+        outcomes_mono = simulate_cohort(therapy=param.Therapies.MONO)
+        outcomes_combo = simulate_cohort(therapy=param.Therapies.COMBO)
+
+    # print the estimates for the mean survival time and mean time to AIDS
+    support.print_outcomes(sim_outcomes=outcomes_mono,
+                           therapy_name=param.Therapies.MONO)
+    support.print_outcomes(sim_outcomes=outcomes_combo,
+                           therapy_name=param.Therapies.COMBO)
+
+    # draw survival curves and histograms
+    support.plot_survival_curves_and_histograms(sim_outcomes_mono=outcomes_mono,
+                                                sim_outcomes_combo=outcomes_combo)
+
+    # print comparative outcomes
+    support.print_comparative_outcomes(sim_outcomes_mono=outcomes_mono,
+                                       sim_outcomes_combo=outcomes_combo)
+
+    # report the CEA results
+    support.report_CEA_CBA(sim_outcomes_mono=outcomes_mono,
+                           sim_outcomes_combo=outcomes_combo)
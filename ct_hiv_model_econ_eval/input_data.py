@@ -7,6 +7,12 @@ ALPHA = 0.05        # significance level for calculating confidence intervals
 DISCOUNT = 0.03     # annual discount rate
 # annual probability of background mortality (number per year per 1,000 population)
 ANNUAL_PROB_BACKGROUND_MORT = 8.15 / 1000
+# set to True to simulate the mono and combination therapy cohorts in parallel processes
+# (only worthwhile on multi-core machines for cohorts of many millions of patients: a cohort takes
+# about 0.5 to 0.8 seconds per million patients on one core, while starting the worker processes takes
+# about 4 seconds on platforms that spawn them, e.g. Windows and macOS; for models simulated with
+# the numba kernel, each worker also loads or compiles the kernel and runs it on half of the cores)
+PARALLEL_COHORTS = False
 
 
 class HealthStates(Enum):
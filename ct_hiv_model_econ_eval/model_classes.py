@@ -1,171 +1,407 @@
-import deampy.econ_eval as econ
 import deampy.statistics as stats
 import numpy as np
-from deampy.markov import Gillespie
-from deampy.plots.sample_paths import PrevalencePathBatchUpdate
+from deampy.sample_path import PrevalenceSamplePath
+from numba import njit, prange
+from scipy.linalg import expm
 
 from ct_hiv_model_econ_eval.input_data import HealthStates
 
+# indices of health states used in the simulation kernel
+# (death states have the highest indices in HealthStates)
+S_AIDS = HealthStates.AIDS.value
+S_HIV_DEATH = HealthStates.HIV_DEATH.value
 
-class Patient:
-    def __init__(self, id, parameters):
-        """ initiates a patient
-        :param id: ID of the patient
-        :param parameters: an instance of the parameters class
+# number of independent streams of random numbers used to simulate a cohort
+# (patients are simulated in parallel across these streams)
+N_RNG_STREAMS = 16
+# number of uniform random numbers drawn at once from each stream
+UNIFORM_BUFFER_SIZE = 2048
+# tolerance when counting the time steps of a simulation (sim_length / delta can be slightly above
+# a whole number because of floating-point rounding, e.g. 0.07 / 0.01 = 7.000000000000001,
+# which would otherwise add a time step of nearly zero length)
+TIME_STEP_TOLERANCE = 1e-9
+
+
+class Cohort:
+    def __init__(self, id, pop_size, parameters):
+        """ create a cohort of patients
+        :param id: cohort ID
+        :param pop_size: population size of this cohort
+        :param parameters: parameters
         """
         self.id = id
+        self.popSize = pop_size
         self.params = parameters
-        self.stateMonitor = PatientStateMonitor(parameters=parameters)  # patient state monitor
+        self.cohortOutcomes = CohortOutcomes(pop_size=pop_size)  # outcomes of this simulated cohort
 
     def simulate(self, sim_length):
-        """ simulate the patient over the specified simulation length """
+        """ simulate the cohort of patients over the specified simulation length
+        (if all patients reach an absorbing state within a bounded number of transitions, their trajectories
+        are sampled at once with simulate_phase_type(), which needs no JIT compilation; otherwise,
+        patients are simulated one by one with simulate_gillespie())
+        :param sim_length: simulation length
+        """
 
-        # random number generator for this patient
-        rng = np.random.RandomState(seed=self.id)
-        # gillespie algorithm
-        gillespie = Gillespie(transition_rate_matrix=self.params.transRateMatrix)
+        if self.params.maxJumps is not None:
+            self.simulate_phase_type(sim_length=sim_length)
+        else:
+            self.simulate_gillespie(sim_length=sim_length)
 
-        t = 0  # simulation time
-        if_stop = False
+    def simulate_gillespie(self, sim_length):
+        """ simulate the cohort of patients over the specified simulation length by simulating the trajectory
+        of each patient with the Gillespie algorithm in a numba-compiled kernel (the kernel is compiled
+        on its first use and then loaded from numba's cache)
+        :param sim_length: simulation length
+        """
 
-        while not if_stop:
-            # find time until next event (dt), and next state
-            # (note that the gillespie algorithm returns None for dt if the process
-            # is in an absorbing state)
-            dt, new_state_index = gillespie.get_next_state(
-                current_state_index=self.stateMonitor.currentState.value,
-                rng=rng)
+        self.cohortOutcomes.reset()
+
+        # independent streams of random numbers (PCG64 bit generators jumped ahead from the cohort ID)
+        bit_generator = np.random.PCG64(seed=self.id)
+        rngs = tuple(np.random.Generator(bit_generator.jumped(i)) for i in range(N_RNG_STREAMS))
+
+        # simulate all patients (outcomes of patient i are stored at index i of cohort outcomes)
+        _simulate_cohort(rngs=rngs,
+                         row_sums=self.params.rowSums,
+                         cum_probs=self.params.cumProbs,
+                         annual_costs=self.params.annualTotalCosts,
+                         annual_utilities=self.params.annualStateUtilities,
+                         discount_rate=self.params.discountRate,
+                         init_state=self.params.initialHealthState.value,
+                         sim_length=sim_length,
+                         pop_size=self.popSize,
+                         out_surv=self.cohortOutcomes.patientSurvivalTimes,
+                         out_aids=self.cohortOutcomes.patientTimesToAIDS,
+                         out_cost=self.cohortOutcomes.costs,
+                         out_util=self.cohortOutcomes.utilities)
 
-            # stop if time to next event (dt) is None (i.e. we have reached an absorbing state)
-            if dt is None:
-                if_stop = True
+        # calculate cohort outcomes
+        self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
 
-            else:
-                # else if next event occurs beyond simulation length
-                if dt + t > sim_length:
-                    # advance time to the end of the simulation and stop
-                    t = sim_length
-                    # the individual stays in the current state until the end of the simulation
-                    new_state_index = self.stateMonitor.currentState.value
-                    if_stop = True
-                else:
-                    # advance time to the time of next event
-                    t += dt
-                # update health state
-                self.stateMonitor.update(time=t, new_state=HealthStates(new_state_index))
-
-
-class PatientStateMonitor:
-    """ to update patient outcomes (years survived, cost, etc.) throughout the simulation """
-    def __init__(self, parameters):
-
-        self.currentState = parameters.initialHealthState   # initial health state
-        self.survivalTime = None      # survival time
-        self.timeToAIDS = None        # time to develop AIDS
-        # patient's cost and utility monitor
-        self.costUtilityMonitor = PatientCostUtilityMonitor(parameters=parameters)
-
-    def update(self, time, new_state):
-        """
-        update the current health state to the new health state
-        :param time: current time
-        :param new_state: new state
+    def simulate_phase_type(self, sim_length):
+        """ simulate the cohort of patients over the specified simulation length by sampling the trajectories
+        of all patients at once until they reach an absorbing state (only for models where all patients reach
+        an absorbing state within a bounded number of transitions; see Parameters.maxJumps)
+        :param sim_length: simulation length
         """
 
-        # update survival time
-        if new_state in (HealthStates.HIV_DEATH, HealthStates.NATUAL_DEATH):
-            self.survivalTime = time
+        if self.params.maxJumps is None:
+            raise ValueError('The trajectories of patients can only be sampled at once if all patients reach '
+                             'an absorbing state within a bounded number of transitions.')
+
+        self.cohortOutcomes.reset()
+
+        # random number generator for this cohort
+        rng = np.random.Generator(np.random.PCG64(seed=self.id))
+
+        # sample the trajectories of all patients
+        times, states = _simulate_phase_type(row_sums=self.params.rowSums,
+                                             cum_probs=self.params.cumProbs,
+                                             init_state=self.params.initialHealthState.value,
+                                             pop_size=self.popSize,
+                                             max_jumps=self.params.maxJumps,
+                                             rng=rng)
+
+        # cut the trajectories at the end of the simulation
+        times = np.minimum(times, sim_length)
+
+        for j in range(self.params.maxJumps):
+            # patients who are not in an absorbing state before transition j + 1
+            alive = np.flatnonzero(self.params.rowSums[states[:, j]] > 0)
+            old_states = states[alive, j]
+            new_states = states[alive, j + 1]
+            t_new = times[alive, j + 1]
+            # transitions that occur before the end of the simulation
+            if_event = t_new < sim_length
+
+            # update cost and utility over the period spent in the state before this transition
+            discount_factor = _continuous_discount_factor(
+                discount_rate=self.params.discountRate, t_start=times[alive, j], t_end=t_new)
+            self.cohortOutcomes.costs[alive] += self.params.annualTotalCosts[old_states] * discount_factor
+            self.cohortOutcomes.utilities[alive] += self.params.annualStateUtilities[old_states] * discount_factor
+
+            # update survival time (HIV death or natural death)
+            if_death = if_event & (new_states >= S_HIV_DEATH)
+            self.cohortOutcomes.patientSurvivalTimes[alive[if_death]] = t_new[if_death]
+
+            # update time until AIDS
+            if_aids = if_event & (old_states != S_AIDS) & (new_states == S_AIDS)
+            self.cohortOutcomes.patientTimesToAIDS[alive[if_aids]] = t_new[if_aids]
 
-        # update time until AIDS
-        if self.currentState != HealthStates.AIDS and new_state == HealthStates.AIDS:
-            self.timeToAIDS = time
+        # calculate cohort outcomes
+        self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
 
-        # update cost and utility
-        self.costUtilityMonitor.update(time=time,
-                                       current_state=self.currentState)
+    def simulate_gpu(self, sim_length):
+        """ simulate the cohort of patients over the specified simulation length on a CUDA GPU
+        (each GPU thread simulates one patient)
+        :param sim_length: simulation length
+        """
 
-        # update current health state
-        self.currentState = new_state
+        # the GPU kernel is in its own module, so numba.cuda is only imported when it is used
+        from ct_hiv_model_econ_eval.model_gpu import simulate_cohort_gpu
+        simulate_cohort_gpu(cohort=self, sim_length=sim_length)
 
+    def simulate_time_steps(self, sim_length, delta):
+        """ simulate the cohort of patients over the specified simulation length by advancing all patients
+        together in time steps of length delta (an approximation to simulate(); the next state of patients
+        at the end of each time step is sampled from the transition probability matrix exp(Q*delta),
+        where Q is the generator matrix of the model, and events are recorded at the end of time steps;
+        if sim_length is not a multiple of delta, the last time step is shortened to end at sim_length)
+        :param sim_length: simulation length
+        :param delta: length of time steps
+        """
 
-class PatientCostUtilityMonitor:
+        if delta <= 0:
+            raise ValueError('The length of time steps should be positive.')
 
-    def __init__(self, parameters):
+        self.cohortOutcomes.reset()
 
-        self.tLastRecorded = 0  # time when the last cost and outcomes got recorded
+        # random number generator for this cohort
+        rng = np.random.Generator(np.random.PCG64(seed=self.id))
 
-        # model parameters for this patient
-        self.params = parameters
+        # parameters and outcomes used in the loop over time steps (bound to local names once)
+        row_sums = self.params.rowSums
+        annual_costs = self.params.annualTotalCosts
+        annual_utilities = self.params.annualStateUtilities
+        survival_times = self.cohortOutcomes.patientSurvivalTimes
+        times_to_AIDS = self.cohortOutcomes.patientTimesToAIDS
+        tot_disc_costs = self.cohortOutcomes.costs
+        tot_disc_utilities = self.cohortOutcomes.utilities
 
-        # total cost and utility
-        self.totalDiscountedCost = 0
-        self.totalDiscountedUtility = 0
+        # times at the end of time steps (the last time step ends at sim_length)
+        n_steps = int(np.ceil(sim_length / delta - TIME_STEP_TOLERANCE))
+        step_times = np.minimum(np.arange(n_steps + 1) * delta, sim_length)
+        step_times[-1] = sim_length
 
-    def update(self, time, current_state):
-        """ updates the discounted total cost and health utility
-        :param time: simulation time
-        :param current_state: current health state
-        """
+        # cumulative transition probabilities over a time step and over the last time step
+        generator_matrix = self.params.transRateArray - np.diag(row_sums)
+        cum_probs = np.cumsum(expm(generator_matrix * delta), axis=1)
+        last_cum_probs = np.cumsum(expm(generator_matrix * (step_times[-1] - step_times[-2])), axis=1)
 
-        # cost and utility (per unit of time) during the period since the last recording until now
-        cost = self.params.annualStateCosts[current_state.value] + self.params.annualTreatmentCost
-        utility = self.params.annualStateUtilities[current_state.value]
+        # discount factors of time steps (for a continuous payment of 1 per unit of time)
+        discount_factors = _continuous_discount_factor(
+            discount_rate=self.params.discountRate, t_start=step_times[:-1], t_end=step_times[1:])
 
-        # discounted cost and utility (continuously compounded)
-        discounted_cost = econ.pv_continuous_payment(payment=cost,
-                                                     discount_rate=self.params.discountRate,
-                                                     discount_period=(self.tLastRecorded, time))
-        discounted_utility = econ.pv_continuous_payment(payment=utility,
-                                                        discount_rate=self.params.discountRate,
-                                                        discount_period=(self.tLastRecorded, time))
+        # health states of patients
+        current_states = np.full(self.popSize, self.params.initialHealthState.value)
 
-        # update total discounted cost and utility
-        self.totalDiscountedCost += discounted_cost
-        self.totalDiscountedUtility += discounted_utility
+        # patients who are not yet in an absorbing state
+        active = np.flatnonzero(row_sums[current_states] > 0)
 
-        # update the time since last recording to the current time
-        self.tLastRecorded = time
+        for k in range(n_steps):
+            # stop if all patients are in absorbing states
+            if len(active) == 0:
+                break
 
+            # find the next states (the number of cumulative probabilities not exceeding
+            # a uniform random number drawn between 0 and the sum of probabilities)
+            states = current_states[active]
+            probs = last_cum_probs[states] if k == n_steps - 1 else cum_probs[states]
+            u = rng.random(len(active)) * probs[:, -1]
+            new_states = (probs <= u[:, None]).sum(axis=1)
 
-class Cohort:
-    def __init__(self, id, pop_size, parameters):
-        """ create a cohort of patients
-        :param id: cohort ID
-        :param pop_size: population size of this cohort
-        :param parameters: parameters
-        """
-        self.id = id
-        self.popSize = pop_size
-        self.params = parameters
-        self.cohortOutcomes = CohortOutcomes()  # outcomes of this simulated cohort
+            # update cost and utility over this time step (patients stay in their current state
+            # until the end of the time step)
+            tot_disc_costs[active] += annual_costs[states] * discount_factors[k]
+            tot_disc_utilities[active] += annual_utilities[states] * discount_factors[k]
 
-    def simulate(self, sim_length):
-        """ simulate the cohort of patients over the specified number of time-steps
-        :param sim_length: simulation length
-        """
+            # update survival time (HIV death or natural death)
+            if_death = new_states >= S_HIV_DEATH
+            survival_times[active[if_death]] = step_times[k + 1]
 
-        # populate and simulate the cohort
-        for i in range(self.popSize):
-            # create a new patient (use id * pop_size + n as patient id)
-            patient = Patient(id=self.id * self.popSize + i,
-                              parameters=self.params)
-            # simulate
-            patient.simulate(sim_length)
+            # update time until AIDS
+            if_aids = (states != S_AIDS) & (new_states == S_AIDS)
+            times_to_AIDS[active[if_aids]] = step_times[k + 1]
 
-            # store outputs of this simulation
-            self.cohortOutcomes.extract_outcome(simulated_patient=patient)
+            # update health states and remove patients who reached an absorbing state
+            current_states[active] = new_states
+            active = active[row_sums[new_states] > 0]
 
         # calculate cohort outcomes
         self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
 
 
+def _simulate_phase_type(row_sums, cum_probs, init_state, pop_size, max_jumps, rng):
+    """ samples the trajectories of all patients at once until they reach an absorbing state
+    :param row_sums: (np.ndarray) sum of rates out of each state
+    :param cum_probs: (np.ndarray) cumulative probabilities of moving to each state
+    :param init_state: index of the initial health state
+    :param pop_size: population size
+    :param max_jumps: maximum number of transitions before reaching an absorbing state
+    :param rng: random number generator
+    :return: (times, states) arrays of shape (pop_size, max_jumps + 1) where patient i enters state states[i, j]
+             at time times[i, j] (after reaching an absorbing state, the state stays the same and the time is inf)
+    """
+
+    times = np.empty((pop_size, max_jumps + 1))
+    states = np.empty((pop_size, max_jumps + 1), dtype=np.int64)
+    times[:, 0] = 0
+    states[:, 0] = init_state
+
+    for j in range(max_jumps):
+        s = states[:, j]
+        rates = row_sums[s]
+        if_absorbed = rates == 0
+
+        # find time until next transition (inf for patients in an absorbing state)
+        dt = np.full(pop_size, np.inf)
+        np.divide(-np.log(1 - rng.random(pop_size)), rates, out=dt, where=~if_absorbed)
+
+        # find the next states (the number of cumulative probabilities not exceeding
+        # a uniform random number drawn between 0 and the sum of probabilities)
+        probs = cum_probs[s]
+        u = rng.random(pop_size) * probs[:, -1]
+        new_states = (probs <= u[:, None]).sum(axis=1)
+
+        times[:, j + 1] = times[:, j] + dt
+        states[:, j + 1] = np.where(if_absorbed, s, new_states)
+
+    return times, states
+
+
+@njit(parallel=True, cache=True)
+def _simulate_cohort(rngs, row_sums, cum_probs, annual_costs, annual_utilities, discount_rate, init_state,
+                     sim_length, pop_size, out_surv, out_aids, out_cost, out_util):
+    """ simulates the patients of a cohort in parallel
+    (the trajectory of each patient is independent of other patients)
+    :param rngs: (tuple) random number generators; patients i, i + len(rngs), i + 2*len(rngs), ...
+                 are simulated using the random number generator i
+    :param row_sums: (np.ndarray) sum of rates out of each state
+    :param cum_probs: (np.ndarray) cumulative probabilities of moving to each state
+    :param annual_costs: (np.ndarray) annual cost of each health state (including the treatment cost)
+    :param annual_utilities: (np.ndarray) annual utility of each health state
+    :param discount_rate: discount rate
+    :param init_state: index of the initial health state
+    :param sim_length: simulation length
+    :param pop_size: population size
+    :param out_surv: (np.ndarray) to store survival times (nan if the patient survived the simulation)
+    :param out_aids: (np.ndarray) to store times to AIDS (nan if the patient did not develop AIDS)
+    :param out_cost: (np.ndarray) to store discounted costs
+    :param out_util: (np.ndarray) to store discounted utilities
+    """
+
+    n_streams = len(rngs)
+    for k in prange(n_streams):
+        rng = rngs[k]
+        # buffer of uniform random numbers (empty at the start, so it is filled before the first draw)
+        u_buf = np.empty(UNIFORM_BUFFER_SIZE)
+        u_idx = UNIFORM_BUFFER_SIZE
+        for i in range(k, pop_size, n_streams):
+            out_surv[i], out_aids[i], out_cost[i], out_util[i], u_idx = _simulate_patient(
+                rng, u_buf, u_idx,
+                row_sums, cum_probs, annual_costs, annual_utilities, discount_rate, init_state, sim_length)
+
+
+@njit(cache=True)
+def _simulate_patient(rng, u_buf, u_idx, row_sums, cum_probs, annual_costs, annual_utilities, discount_rate,
+                      init_state, sim_length):
+    """ simulates the trajectory of a patient using the Gillespie algorithm
+    :param rng: random number generator
+    :param u_buf: (np.ndarray) buffer of uniform random numbers (refilled from rng when exhausted)
+    :param u_idx: index of the next unused random number in u_buf
+    (the other parameters are as described in _simulate_cohort)
+    :return: (survival time, time to AIDS, discounted cost, discounted utility, u_idx) of this patient
+             (survival time and time to AIDS are nan if the patient does not die or develop AIDS;
+             u_idx is the index of the next unused random number in u_buf)
+    """
+
+    survival_time = np.nan
+    time_to_AIDS = np.nan
+    tot_disc_cost = 0.0
+    tot_disc_utility = 0.0
+
+    t = 0.0  # simulation time
+    s = init_state  # current state
+    if_stop = False
+
+    # stop if we have reached an absorbing state
+    while not if_stop and row_sums[s] > 0:
+
+        # draw 2 uniform random numbers (refill the buffer if fewer than 2 are left)
+        if u_idx + 2 > len(u_buf):
+            u_buf[:] = rng.random(len(u_buf))
+            u_idx = 0
+        u1 = u_buf[u_idx]
+        u2 = u_buf[u_idx + 1]
+        u_idx += 2
+
+        # find time until next event (dt)
+        dt = -np.log(1 - u1) / row_sums[s]
+
+        # find the next state (the first state whose cumulative probability exceeds
+        # a uniform random number drawn between 0 and the sum of probabilities, found by binary search)
+        u = u2 * cum_probs[s, -1]
+        new_s = 0
+        upper = cum_probs.shape[1] - 1
+        while new_s < upper:
+            mid = (new_s + upper) // 2
+            if cum_probs[s, mid] <= u:
+                new_s = mid + 1
+            else:
+                upper = mid
+
+        # if next event occurs beyond simulation length
+        if dt + t > sim_length:
+            # the individual stays in the current state until the end of the simulation
+            t_new = sim_length
+            new_s = s
+            if_stop = True
+        else:
+            # advance time to the time of next event
+            t_new = t + dt
+
+        # update cost and utility over the period since the last event
+        discount_factor = _continuous_discount_factor_jit(discount_rate=discount_rate, t_start=t, t_end=t_new)
+        tot_disc_cost += annual_costs[s] * discount_factor
+        tot_disc_utility += annual_utilities[s] * discount_factor
+
+        # update survival time (HIV death or natural death)
+        if new_s >= S_HIV_DEATH:
+            survival_time = t_new
+
+        # update time until AIDS
+        if s != S_AIDS and new_s == S_AIDS:
+            time_to_AIDS = t_new
+
+        # update time and health state
+        t = t_new
+        s = new_s
+
+    return survival_time, time_to_AIDS, tot_disc_cost, tot_disc_utility, u_idx
+
+
+def _continuous_discount_factor(discount_rate, t_start, t_end):
+    """ calculates the present value of a continuous payment of 1 per unit of time (discounted continuously)
+    :param discount_rate: discount rate
+    :param t_start: time when the payments start
+    :param t_end: time when the payments end
+    :return: (exp(-discount_rate*t_start) - exp(-discount_rate*t_end))/discount_rate
+    """
+    if discount_rate == 0:
+        return t_end - t_start
+    else:
+        return (np.exp(-discount_rate * t_start) - np.exp(-discount_rate * t_end)) / discount_rate
+
+
+# compiled version of the function above to call from the numba kernels
+_continuous_discount_factor_jit = njit(cache=True)(_continuous_discount_factor)
+
+
 class CohortOutcomes:
-    def __init__(self):
+    def __init__(self, pop_size):
+        """
+        :param pop_size: population size of the cohort
+        """
 
-        self.survivalTimes = []         # patients' survival times
-        self.timesToAIDS = []           # patients' times to AIDS
-        self.costs = []                 # patients' discounted costs
-        self.utilities =[]              # patients' discounted utilities
+        # outcomes of patients (the outcome of patient i is stored at index i; survival times and
+        # times to AIDS are nan for patients who did not die or develop AIDS)
+        self.patientSurvivalTimes = np.full(pop_size, np.nan)   # patients' survival times
+        self.patientTimesToAIDS = np.full(pop_size, np.nan)     # patients' times to AIDS
+        self.costs = np.zeros(pop_size)                         # patients' discounted costs
+        self.utilities = np.zeros(pop_size)                     # patients' discounted utilities
+
+        self.survivalTimes = None       # survival times of patients who died
+        self.timesToAIDS = None         # times to AIDS of patients who developed AIDS
         self.nLivingPatients = None     # survival curve (sample path of number of alive patients over time)
 
         self.statSurvivalTime = None    # summary statistics for survival time
@@ -173,24 +409,23 @@ class CohortOutcomes:
         self.statCost = None            # summary statistics for discounted cost
         self.statUtility = None         # summary statistics for discounted utility
 
-    def extract_outcome(self, simulated_patient):
-        """ extracts outcomes of a simulated patient
-        :param simulated_patient: a simulated patient"""
+    def reset(self):
+        """ resets the outcomes of patients before simulating the cohort """
 
-        # record survival time and time until AIDS
-        if simulated_patient.stateMonitor.survivalTime is not None:
-            self.survivalTimes.append(simulated_patient.stateMonitor.survivalTime)
-        if simulated_patient.stateMonitor.timeToAIDS is not None:
-            self.timesToAIDS.append(simulated_patient.stateMonitor.timeToAIDS)
-        # discounted cost and discounted utility
-        self.costs.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
-        self.utilities.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
+        self.patientSurvivalTimes[:] = np.nan
+        self.patientTimesToAIDS[:] = np.nan
+        self.costs[:] = 0
+        self.utilities[:] = 0
 
     def calculate_cohort_outcomes(self, initial_pop_size):
         """ calculates the cohort outcomes
         :param initial_pop_size: initial population size
         """
 
+        # survival times and times to AIDS of patients who died or developed AIDS
+        self.survivalTimes = self.patientSurvivalTimes[~np.isnan(self.patientSurvivalTimes)]
+        self.timesToAIDS = self.patientTimesToAIDS[~np.isnan(self.patientTimesToAIDS)]
+
         # summary statistics
         self.statSurvivalTime = stats.SummaryStat(name='Survival time', data=self.survivalTimes)
         self.statTimeToAIDS = stats.SummaryStat(name='Time until AIDS', data=self.timesToAIDS)
@@ -198,10 +433,77 @@ class CohortOutcomes:
         self.statUtility = stats.SummaryStat(name='Discounted utility', data=self.utilities)
 
         # survival curve
-        self.nLivingPatients = PrevalencePathBatchUpdate(
+        self.nLivingPatients = SurvivalCurve(
             name='# of living patients',
             initial_size=initial_pop_size,
-            times_of_changes=self.survivalTimes,
-            increments=[-1] * len(self.survivalTimes)
+            survival_times=self.survivalTimes
         )
 
+
+class SurvivalCurve(PrevalenceSamplePath):
+    """ sample path of the number of living patients over time, built at once from survival times
+    (gives the same times and values as PrevalencePathBatchUpdate with an increment of -1 at each survival time;
+    unlike PrevalencePathBatchUpdate, it does not collect statistics and so has no .stat attribute) """
+
+    def __init__(self, name, initial_size, survival_times):
+        """
+        :param name: name of this sample path
+        :param initial_size: (int) number of living patients at simulation time 0
+        :param survival_times: (np.ndarray) survival times of patients who died
+        """
+
+        PrevalenceSamplePath.__init__(self, name=name, initial_size=initial_size, collect_stat=False)
+
+        # times of deaths and the number of living patients right after each of these times
+        # (the number of patients who died at or before each time is found from the sorted survival times)
+        sorted_times = np.sort(survival_times)
+        times = np.unique(sorted_times)
+        values = initial_size - np.searchsorted(sorted_times, times, side='right')
+
+        # record one observation per distinct time of death
+        # (deaths at time 0 overwrite the value recorded at time 0)
+        self.populate(times=times.tolist(), values=values.tolist())
+
+
+if __name__ == '__main__':
+    from deampy.plots.sample_paths import PrevalencePathBatchUpdate
+
+    import ct_hiv_model_econ_eval.param_classes as param
+
+    # test that simulate_phase_type and simulate_gillespie agree statistically
+    # (differences in mean outcomes are compared to their standard errors)
+    for therapy in param.Therapies:
+        cohort = Cohort(id=1, pop_size=100000, parameters=param.Parameters(therapy=therapy))
+        outcomes = {}
+        for method in (cohort.simulate_phase_type, cohort.simulate_gillespie):
+            method(sim_length=50)
+            outcomes[method.__name__] = {'survived': np.isnan(cohort.cohortOutcomes.patientSurvivalTimes),
+                                         'AIDS': ~np.isnan(cohort.cohortOutcomes.patientTimesToAIDS),
+                                         'cost': cohort.cohortOutcomes.costs.copy(),
+                                         'utility': cohort.cohortOutcomes.utilities.copy()}
+
+        for outcome in ('survived', 'AIDS', 'cost', 'utility'):
+            x = outcomes['simulate_phase_type'][outcome]
+            y = outcomes['simulate_gillespie'][outcome]
+            z = (x.mean() - y.mean()) / np.sqrt((x.var() + y.var()) / cohort.popSize)
+            print(therapy.name, outcome, ': ', abs(z) < 4)
+
+    # test that SurvivalCurve gives the same sample path as PrevalencePathBatchUpdate
+    # for continuous survival times, ties, deaths at time 0, and no deaths
+    test_cases = {'continuous': np.random.default_rng(seed=1).exponential(scale=5, size=1000),
+                  'ties': np.array([2.0, 0.5, 2.0, 3.5, 0.5, 2.0]),
+                  'deaths at time 0': np.array([0.0, 0.0, 1.5, 0.0, 4.0]),
+                  'no deaths': np.array([])}
+
+    for case, survival_times in test_cases.items():
+        survival_curve = SurvivalCurve(name='# of living patients',
+                                       initial_size=1000,
+                                       survival_times=survival_times)
+        batch_path = PrevalencePathBatchUpdate(name='# of living patients',
+                                               initial_size=1000,
+                                               times_of_changes=survival_times.tolist(),
+                                               increments=[-1] * len(survival_times))
+
+        if_equal = survival_curve.get_times() == batch_path.get_times() \
+            and survival_curve.get_values() == batch_path.get_values()
+        print(case, ': ', if_equal)
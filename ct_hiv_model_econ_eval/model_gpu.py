@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+from numba import cuda
+from numba.cuda.random import create_xoroshiro128p_states, xoroshiro128p_uniform_float32
+
+from ct_hiv_model_econ_eval.model_classes import S_AIDS, S_HIV_DEATH
+
+# number of threads per block when simulating a cohort on a GPU
+GPU_THREADS_PER_BLOCK = 256
+
+
+def simulate_cohort_gpu(cohort, sim_length):
+    """ simulates the patients of a cohort over the specified simulation length on a CUDA GPU
+    (each GPU thread simulates one patient; the outcomes are stored in cohort.cohortOutcomes)
+    :param cohort: cohort to simulate
+    :param sim_length: simulation length
+    """
+
+    params = cohort.params
+    cohort_outcomes = cohort.cohortOutcomes
+
+    cohort_outcomes.reset()
+
+    # copy parameters to the GPU (in single precision)
+    row_sums = cuda.to_device(params.rowSums.astype(np.float32))
+    cum_probs = cuda.to_device(params.cumProbs.astype(np.float32))
+    annual_costs = cuda.to_device(params.annualTotalCosts.astype(np.float32))
+    annual_utilities = cuda.to_device(params.annualStateUtilities.astype(np.float32))
+
+    # outcomes of patients on the GPU (in single precision)
+    survival_times = cuda.device_array(cohort.popSize, dtype=np.float32)
+    times_to_AIDS = cuda.device_array(cohort.popSize, dtype=np.float32)
+    tot_disc_costs = cuda.device_array(cohort.popSize, dtype=np.float32)
+    tot_disc_utilities = cuda.device_array(cohort.popSize, dtype=np.float32)
+
+    # random number generators of patients (seeded with the cohort ID)
+    rng_states = create_xoroshiro128p_states(cohort.popSize, seed=cohort.id)
+
+    # simulate all patients
+    n_blocks = (cohort.popSize + GPU_THREADS_PER_BLOCK - 1) // GPU_THREADS_PER_BLOCK
+    _simulate_cohort_gpu[n_blocks, GPU_THREADS_PER_BLOCK](
+        rng_states, row_sums, cum_probs, annual_costs, annual_utilities, np.float32(params.discountRate),
+        params.initialHealthState.value, np.float32(sim_length),
+        survival_times, times_to_AIDS, tot_disc_costs, tot_disc_utilities)
+
+    # copy outcomes of patients back to the cohort outcomes (in double precision)
+    cohort_outcomes.patientSurvivalTimes[:] = survival_times.copy_to_host()
+    cohort_outcomes.patientTimesToAIDS[:] = times_to_AIDS.copy_to_host()
+    cohort_outcomes.costs[:] = tot_disc_costs.copy_to_host()
+    cohort_outcomes.utilities[:] = tot_disc_utilities.copy_to_host()
+
+    # calculate cohort outcomes
+    cohort_outcomes.calculate_cohort_outcomes(initial_pop_size=cohort.popSize)
+
+
+@cuda.jit
+def _simulate_cohort_gpu(rng_states, row_sums, cum_probs, annual_costs, annual_utilities, discount_rate,
+                         init_state, sim_length, out_surv, out_aids, out_cost, out_util):
+    """ simulates the trajectory of patient i on thread i of a CUDA GPU using the Gillespie algorithm
+    (all floating-point arrays, scalars and calculations are in single precision, including the discount
+    factor computed by _continuous_discount_factor_gpu)
+    :param rng_states: states of the xoroshiro128+ random number generators of patients
+    (the other parameters are as described in model_classes._simulate_cohort)
+    """
+
+    i = cuda.grid(1)
+    if i >= out_surv.shape[0]:
+        return
+
+    one = np.float32(1)
+    survival_time = np.float32(math.nan)
+    time_to_AIDS = np.float32(math.nan)
+    tot_disc_cost = np.float32(0)
+    tot_disc_utility = np.float32(0)
+
+    t = np.float32(0)  # simulation time
+    s = init_state  # current state
+    if_stop = False
+
+    # stop if we have reached an absorbing state
+    while not if_stop and row_sums[s] > 0:
+
+        # find time until next event (dt)
+        dt = -math.log(one - xoroshiro128p_uniform_float32(rng_states, i)) / row_sums[s]
+
+        # find the next state (the first state whose cumulative probability exceeds
+        # a uniform random number drawn between 0 and the sum of probabilities, found by binary search;
+        # the search stops at the last state if the float32 uniform is rounded up to 1)
+        new_s = 0
+        upper = cum_probs.shape[1] - 1
+        u = xoroshiro128p_uniform_float32(rng_states, i) * cum_probs[s, upper]
+        while new_s < upper:
+            mid = (new_s + upper) // 2
+            if cum_probs[s, mid] <= u:
+                new_s = mid + 1
+            else:
+                upper = mid
+
+        # if next event occurs beyond simulation length
+        if dt + t > sim_length:
+            # the individual stays in the current state until the end of the simulation
+            t_new = sim_length
+            new_s = s
+            if_stop = True
+        else:
+            # advance time to the time of next event
+            t_new = t + dt
+
+        # update cost and utility over the period since the last event
+        # (device functions are called with positional arguments)
+        discount_factor = _continuous_discount_factor_gpu(discount_rate, t, t_new)
+        tot_disc_cost += annual_costs[s] * discount_factor
+        tot_disc_utility += annual_utilities[s] * discount_factor
+
+        # update survival time (HIV death or natural death)
+        if new_s >= S_HIV_DEATH:
+            survival_time = t_new
+
+        # update time until AIDS
+        if s != S_AIDS and new_s == S_AIDS:
+            time_to_AIDS = t_new
+
+        # update time and health state
+        t = t_new
+        s = new_s
+
+    out_surv[i] = survival_time
+    out_aids[i] = time_to_AIDS
+    out_cost[i] = tot_disc_cost
+    out_util[i] = tot_disc_utility
+
+
+@cuda.jit(device=True)
+def _continuous_discount_factor_gpu(discount_rate, t_start, t_end):
+    """ calculates the present value of a continuous payment of 1 per unit of time (discounted continuously)
+    on a GPU (the same as model_classes._continuous_discount_factor for scalars; _simulate_cohort_gpu
+    calls it with single-precision arguments, so it is compiled to run in single precision)
+    :param discount_rate: discount rate
+    :param t_start: time when the payments start
+    :param t_end: time when the payments end
+    :return: (exp(-discount_rate*t_start) - exp(-discount_rate*t_end))/discount_rate
+    """
+    if discount_rate == 0:
+        return t_end - t_start
+    else:
+        return (math.exp(-discount_rate * t_start) - math.exp(-discount_rate * t_end)) / discount_rate
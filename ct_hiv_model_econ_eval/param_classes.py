@@ -45,9 +45,23 @@ class Parameters:
                 prob_matrix_mono=prob_matrix_mono,
                 combo_rr=data.TREATMENT_RR)
 
+        # transition rate matrix as a numpy array (used by the simulation kernel)
+        self.transRateArray = get_rate_array(trans_rate_matrix=self.transRateMatrix)
+
+        # sum of rates out of each state and the cumulative probabilities of moving to each state
+        # (the same for all patients, so they are calculated only once)
+        self.rowSums = self.transRateArray.sum(axis=1)
+        self.cumProbs = get_cum_probs(rate_array=self.transRateArray, row_sums=self.rowSums)
+
+        # maximum number of transitions before reaching an absorbing state (None if unbounded)
+        self.maxJumps = get_max_jumps(rate_array=self.transRateArray)
+
         # annual state costs and utilities
         self.annualStateCosts = data.ANNUAL_STATE_COST
-        self.annualStateUtilities = data.ANNUAL_STATE_UTILITY
+        self.annualStateUtilities = np.array(data.ANNUAL_STATE_UTILITY)
+
+        # annual cost of each health state including the treatment cost
+        self.annualTotalCosts = np.array(self.annualStateCosts) + self.annualTreatmentCost
 
         # discount rate
         self.discountRate = data.DISCOUNT
@@ -93,6 +107,57 @@ def get_trans_rate_matrix(trans_prob_matrix):
     return trans_rate_matrix
 
 
+def get_rate_array(trans_rate_matrix):
+    """
+    :param trans_rate_matrix: (list of lists) transition rate matrix
+    :return: (np.ndarray) transition rate matrix with the diagonal elements set to 0
+    """
+
+    # diagonal elements may be None (rate of staying in the same state is not defined)
+    rate_array = np.array(
+        [[0.0 if rate is None else rate for rate in row] for row in trans_rate_matrix],
+        dtype=float)
+    np.fill_diagonal(rate_array, 0)
+
+    return rate_array
+
+
+def get_cum_probs(rate_array, row_sums):
+    """
+    :param rate_array: (np.ndarray) transition rate matrix with the diagonal elements set to 0
+    :param row_sums: (np.ndarray) sum of rates out of each state
+    :return: (np.ndarray) cumulative probabilities of moving to each state given that an event occurs
+             (all zeros for absorbing states)
+    """
+
+    # probability of moving to each state (rate_j / (sum over j of rate_j))
+    probs = np.zeros_like(rate_array)
+    np.divide(rate_array, row_sums[:, None], out=probs, where=row_sums[:, None] > 0)
+
+    return np.cumsum(probs, axis=1)
+
+
+def get_max_jumps(rate_array):
+    """
+    :param rate_array: (np.ndarray) transition rate matrix with the diagonal elements set to 0
+    :return: maximum number of transitions before reaching an absorbing state
+             (None if states can be revisited, in which case the number of transitions is unbounded)
+    """
+
+    # adjacency[i, j] = 1 if state j can be reached from state i in one transition
+    adjacency = (rate_array > 0).astype(int)
+
+    # paths[i, j] > 0 if state j can be reached from state i in exactly n_jumps + 1 transitions
+    paths = adjacency
+    for n_jumps in range(len(rate_array)):
+        if not paths.any():
+            return n_jumps
+        paths = np.minimum(paths @ adjacency, 1)
+
+    # there are paths longer than the number of states, so some states can be revisited
+    return None
+
+
 def get_hr(p0, rr):
     """
     :param p0: (float) the probability of an event in the control group